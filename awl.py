@@ -1,13 +1,13 @@
 #!/usr/bin/env python3
 
 import asyncio
-import copy
+import functools
 import json
 import logging
 import re
 import requests
 from requests.packages.urllib3.util.url import parse_url
-from typing import Any, Dict, Optional, Final
+from typing import Any, Dict, Optional, Final, Tuple
 import websockets
 from autologging import logged, traced
 
@@ -16,6 +16,20 @@ from autologging import logged, traced
 AWL_DEFAULT_TRANSACTION_TIMEOUT: Final = 30
 
 
+@functools.lru_cache(maxsize=None)
+def _zone_rlist(max_zones: int) -> Tuple[str, ...]:
+    # Per-zone read parameters only depend on the zone count,
+    # so build them once per count instead of on every read
+    return tuple(
+        name
+        for zoneid in range(1, max_zones + 1)
+        for name in (
+            f"iz2_z{zoneid}_roomtemp",
+            f"iz2_z{zoneid}_activesettings",
+        )
+    )
+
+
 class AWLException(Exception):
     pass
 
@@ -96,6 +110,8 @@ class AWL:
         self.websockets_connection: Optional[websockets.client.WebSocketClientProtocol] = None
         self._login_data: Optional[dict] = None
         self._websockets_task: Optional[asyncio.Task] = None
+        self._websockets_uri: Optional[str] = None
+        self._session_expires_at: float = 0.0
 
         self._transaction_lock: Final[asyncio.Lock] = asyncio.Lock()
         self._transactions: Final[Dict[int, asyncio.Future]] = dict()
@@ -300,25 +316,40 @@ class AWL:
         if self.websockets_connection is not None:
             await self.websockets_connection.close()
 
+    async def __session_timeout(self, timeout: float) -> None:
+        await asyncio.sleep(timeout)
+        self.__log.info("Reconnecting due to session timeout")
+
     async def __renew_session(self,
                               websockets_uri: str
                               ) -> (asyncio.Task, asyncio.Task):
-        async def __session_timeout():
-            await asyncio.sleep(self.SESSION_TIMEOUT)
-            self.__log.info("Reconnecting due to session timeout")
-
         await self.__websockets_close()
         await self.__http_logout()
         await self.__http_login()
         receive_task = await self.__websockets_connect(websockets_uri)
+        self._session_expires_at = (
+            asyncio.get_running_loop().time() + self.SESSION_TIMEOUT
+        )
         timeout_task = asyncio.create_task(
-            __session_timeout()
+            self.__session_timeout(self.SESSION_TIMEOUT)
         )
 
         return (receive_task, timeout_task,)
 
-    async def __websockets_handler(self, websockets_uri: str) -> None:
-        receive_task, timeout_task = await self.__renew_session(websockets_uri)
+    async def __websockets_handler(self,
+                                   websockets_uri: str,
+                                   receive_task: Optional[asyncio.Task] = None
+                                   ) -> None:
+        if receive_task is None:
+            receive_task, timeout_task = await (
+                self.__renew_session(websockets_uri)
+            )
+        else:
+            # Resumed session; renew it when the original would expire
+            timeout_task = asyncio.create_task(self.__session_timeout(
+                max(self._session_expires_at
+                    - asyncio.get_running_loop().time(), 0.0)
+            ))
         pending = {receive_task, timeout_task}
         while self.websockets_connection.open:
             self.__log.debug('Awaiting timeout or receive loop exit')
@@ -438,11 +469,39 @@ class AWL:
     async def connect(self):
         await self.__http_login()
         websockets_uri = await self.__get_websockets_uri()
+        self._websockets_uri = websockets_uri
 
         self._websockets_task = asyncio.create_task(
             self.__websockets_handler(websockets_uri)
         )
 
+    async def reconnect(self):
+        # Re-open only the websockets connection, logging in to it
+        # with the existing HTTP session instead of logging in again
+        if self._websockets_uri is None or self.session_id is None:
+            raise AWLLoginError("No AWL session to resume")
+
+        await self.__websockets_close()
+        try:
+            receive_task = await (
+                self.__websockets_connect(self._websockets_uri)
+            )
+        except AWLTransactionError as e:
+            # Don't leave the new connection open when its login fails
+            await self.__websockets_close()
+            raise AWLLoginError(f"Could not resume session: {e!s}") from e
+        except AWLException:
+            await self.__websockets_close()
+            raise
+        except OSError as e:
+            raise AWLConnectionError(
+                "Unable to connect to AWL websockets URI"
+            ) from e
+
+        self._websockets_task = asyncio.create_task(
+            self.__websockets_handler(self._websockets_uri, receive_task)
+        )
+
     async def close(self):
         await self.__websockets_close()
 
@@ -461,6 +520,12 @@ class AWL:
     def login_data(self):
         return self._login_data
 
+    @property
+    def close_code(self) -> Optional[int]:
+        if self.websockets_connection is None:
+            return None
+        return self.websockets_connection.close_code
+
     def get_gwid_param(self, gwid: str, param: str) -> Any:
         if self._login_data is None:
             return
@@ -472,15 +537,11 @@ class AWL:
 
     async def read(self, awlid: str, zone: int = 0,
                    timeout: int = AWL_DEFAULT_TRANSACTION_TIMEOUT) -> Any:
-        read_rlist = copy.deepcopy(self.AWL_GATEWAY_RLIST)
+        read_rlist = list(self.AWL_GATEWAY_RLIST)
 
         max_zones = self.get_gwid_param(awlid, 'iz2_max_zones')
         if max_zones:
-            for zoneid in range(1, max_zones + 1):
-                read_rlist.extend([
-                    f"iz2_z{zoneid}_roomtemp",
-                    f"iz2_z{zoneid}_activesettings"
-                ])
+            read_rlist.extend(_zone_rlist(max_zones))
         read_data = await self._command_wait(
             'read',
             awlid=awlid,
@@ -1,23 +1,113 @@
 #!/usr/bin/env python3
 import asyncio
 import logging
+import logging.handlers
 import os
+import queue
 import signal
 import sys
-from typing import Any
+import threading
+from typing import Any, List
 
 import autologging
 from hypercorn import Config as HyperConfig
 from hypercorn.asyncio import serve as hypercorn_serve
 import quart
-from quart.logging import _setup_logging_queue as setup_logging_queue
 
 import waterfurnace
 
 DEFAULT_LOGGING_FORMATTER = logging.Formatter(
-    "%(asctime)s:%(levelname)s:%(name)s:%(funcName)s:%(message)s",
+    "%(asctime)s:%(levelname)s:%(name)s:%(message)s",
 )
 
+# Only the trace log uses caller, process or thread details, so don't
+# collect them for every record; configure_app_logging() turns the
+# ones it needs back on when the trace log is enabled
+_LOGGING_SRCFILE = logging._srcfile
+logging._srcfile = None
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    # The listener runs in this process, so records don't need to be
+    # made picklable; skip the formatting and copy prepare() would do
+    # on the calling thread, like Quart's own LocalQueueHandler
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class BufferedHandler(logging.handlers.MemoryHandler):
+    def emit(self, record: logging.LogRecord) -> None:
+        # Records reach the queue unformatted, so merge the arguments
+        # into the message on the listener thread before buffering;
+        # otherwise a record held for LOG_FLUSH_INTERVAL would be
+        # formatted with whatever its arguments have changed to by then
+        try:
+            record.msg = record.getMessage()
+        except Exception:
+            self.handleError(record)
+            return
+        record.args = None
+        super().emit(record)
+
+
+class BufferedQueueListener(logging.handlers.QueueListener):
+    # Flushes its MemoryHandler buffers every LOG_FLUSH_INTERVAL from a
+    # timer thread of its own, for as long as the listener is running,
+    # so buffered records land promptly under low load without relying
+    # on the event loop or its default executor
+    def __init__(self, queue, *handlers, respect_handler_level=False):
+        super().__init__(queue, *handlers,
+                         respect_handler_level=respect_handler_level)
+        self._buffers = [
+            handler for handler in handlers
+            if isinstance(handler, logging.handlers.MemoryHandler)
+        ]
+        self._stop_flushing = threading.Event()
+        self._flush_thread = None
+
+    def _flush_buffers(self) -> None:
+        for handler in self._buffers:
+            handler.flush()
+
+    def _flush_periodically(self) -> None:
+        while not self._stop_flushing.wait(LOG_FLUSH_INTERVAL):
+            self._flush_buffers()
+
+    def start(self) -> None:
+        super().start()
+        if self._buffers:
+            self._stop_flushing.clear()
+            self._flush_thread = threading.Thread(
+                target=self._flush_periodically,
+                name='log_flush',
+                daemon=True
+            )
+            self._flush_thread.start()
+
+    def stop(self) -> None:
+        # Drain the queue into the buffers, then write out what's left
+        super().stop()
+        if self._flush_thread is not None:
+            self._stop_flushing.set()
+            self._flush_thread.join()
+            self._flush_thread = None
+        self._flush_buffers()
+
+
+# Every handler is fed from this queue by a single listener thread,
+# so log calls on the event loop only pay for an enqueue
+LOG_QUEUE = queue.SimpleQueue()
+LOG_QUEUE_HANDLER = LocalQueueHandler(LOG_QUEUE)
+
+ACCESS_LOG_FILTER = logging.Filter('quart.serving')
+
+# File logs are buffered and written out in batches: when the buffer
+# fills, on an error, or at least this often
+LOG_BUFFER_CAPACITY = 512
+LOG_FLUSH_INTERVAL = 2.0
+
 waterfurnace.app.shutdown_trigger = asyncio.Event()
 
 
@@ -33,7 +123,22 @@ def _loop_exception_handler(loop, context):
     waterfurnace.app.shutdown_trigger.set()
 
 
-def configure_default_logging() -> None:
+def _exclude_access_log(record: logging.LogRecord) -> bool:
+    return not ACCESS_LOG_FILTER.filter(record)
+
+
+def _buffered_handler(target: logging.Handler) -> logging.Handler:
+    buffer_handler = BufferedHandler(
+        LOG_BUFFER_CAPACITY,
+        flushLevel=logging.ERROR,
+        target=target,
+        flushOnClose=True
+    )
+    buffer_handler.setLevel(target.level)
+    return buffer_handler
+
+
+def configure_default_logging() -> List[logging.Handler]:
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.ERROR)
     console_handler.setFormatter(DEFAULT_LOGGING_FORMATTER)
@@ -43,8 +148,7 @@ def configure_default_logging() -> None:
 
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(setup_logging_queue(console_handler))
-    root_logger.addHandler(setup_logging_queue(syslog_handler))
+    root_logger.addHandler(LOG_QUEUE_HANDLER)
 
     # Set default levels
     logging.getLogger('awl.AWL').setLevel(logging.ERROR)
@@ -52,6 +156,8 @@ def configure_default_logging() -> None:
     # Suppress access logs by default
     logging.getLogger('quart.serving').setLevel(logging.ERROR)
 
+    return [console_handler, syslog_handler]
+
 
 def configure_app(app: quart.Quart):
     # Different defaults based on development vs production
@@ -93,7 +199,11 @@ def configure_app(app: quart.Quart):
             sys.exit(255)
 
 
-def configure_app_logging(app: quart.Quart):
+def configure_app_logging(app: quart.Quart,
+                          handlers: List[logging.Handler]
+                          ) -> List[logging.Handler]:
+    app_handlers = list()
+
     if app.config.get('ACCESS_LOG') is not None:
         access_handler = logging.handlers.TimedRotatingFileHandler(
             os.path.join(
@@ -106,12 +216,17 @@ def configure_app_logging(app: quart.Quart):
             logging.Formatter('%(asctime)s %(message)s')
         )
         access_handler.setLevel(logging.INFO)
+        access_buffer = _buffered_handler(access_handler)
+        access_buffer.addFilter(ACCESS_LOG_FILTER)
         access_logger = logging.getLogger('quart.serving')
         access_logger.setLevel(logging.INFO)
-        # Disable propagation so access lines don't show
-        # up in any other logs
+        # Disable propagation and filter the shared listener's
+        # other handlers so access lines don't show up in any other logs
         access_logger.propagate = False
-        access_logger.addHandler(setup_logging_queue(access_handler))
+        access_logger.addHandler(LOG_QUEUE_HANDLER)
+        for handler in handlers:
+            handler.addFilter(_exclude_access_log)
+        app_handlers.append(access_buffer)
 
     if app.config.get('TRACE_LOG') is not None:
         trace_handler = logging.handlers.TimedRotatingFileHandler(
@@ -119,17 +234,38 @@ def configure_app_logging(app: quart.Quart):
             when='midnight'
         )
         trace_handler.setLevel(autologging.TRACE)
+        logging._srcfile = _LOGGING_SRCFILE
+        logging.logProcesses = True
         trace_handler.setFormatter(logging.Formatter(
             "%(asctime)s:%(process)s:%(levelname)s:%(filename)s:"
             "%(lineno)s:%(name)s:%(funcName)s:%(message)s"
         ))
-        logging.getLogger().addHandler(setup_logging_queue(trace_handler))
+        trace_buffer = _buffered_handler(trace_handler)
+        if app.config.get('ACCESS_LOG') is not None:
+            trace_buffer.addFilter(_exclude_access_log)
+        app_handlers.append(trace_buffer)
         logging.getLogger().setLevel(autologging.TRACE)
 
         logging.getLogger("awl.AWL").setLevel(autologging.TRACE)
         logging.getLogger("websockets").setLevel(logging.DEBUG)
         logging.getLogger("quart").setLevel(logging.DEBUG)
 
+    return app_handlers
+
+
+def start_logging_listener(app: quart.Quart,
+                           handlers: List[logging.Handler]) -> None:
+    listener = BufferedQueueListener(
+        LOG_QUEUE,
+        *handlers,
+        respect_handler_level=True
+    )
+    listener.start()
+
+    @app.after_serving
+    async def stop_logging_listener():
+        listener.stop()
+
 
 def run_hypercorn(app: quart.Quart):
     config = HyperConfig()
@@ -155,7 +291,10 @@ def run_hypercorn(app: quart.Quart):
 
 
 if __name__ == '__main__':
-    configure_default_logging()
+    log_handlers = configure_default_logging()
     configure_app(waterfurnace.app)
-    configure_app_logging(waterfurnace.app)
+    log_handlers.extend(
+        configure_app_logging(waterfurnace.app, log_handlers)
+    )
+    start_logging_listener(waterfurnace.app, log_handlers)
     run_hypercorn(waterfurnace.app)
@@ -1,20 +1,23 @@
 import asyncio
 import functools
 import logging
+import random
+import re
 
 import backoff
+import orjson
 import quart
-from quart import abort, jsonify, request
+from quart import abort, request
 
 from awl import (
     AWL,
     AWLConnectionError,
+    AWLException,
     AWLNotConnectedError,
     AWLLoginError,
     AWLTransactionError,
     AWLTransactionTimeout
 )
-from timed_cache import timed_cache
 
 
 # Monkeypatch Quart's logging functions so
@@ -34,11 +37,43 @@ def get_runtime_config(key, default=None):
     return functools.partial(app.config.get, key, default)
 
 
+def ojsonify(obj):
+    return quart.Response(orjson.dumps(obj), mimetype='application/json')
+
+
+# Websockets close codes (going away, abnormal closure) that leave
+# the AWL session itself usable
+AWL_RESUMABLE_CLOSE_CODES = (1001, 1006)
+
+
+async def resume_awl_session():
+    if app.awl_connection.close_code not in AWL_RESUMABLE_CLOSE_CODES:
+        return False
+
+    await asyncio.sleep(1)
+    app.logger.info('Resuming AWL session')
+    try:
+        await app.awl_connection.reconnect()
+    except (AWLConnectionError, AWLLoginError):
+        app.logger.warning('Could not resume AWL session; logging in again')
+        return False
+
+    asyncio.create_task(
+        awl_reconnection_handler(),
+        name='reconnection_loop'
+    )
+    return True
+
+
 async def awl_reconnection_handler():
     try:
         await app.awl_connection.wait_closed()
-        app.logger.debug('app.awl_connection.wait_closed() finished')
+        if app.logger.isEnabledFor(logging.DEBUG):
+            app.logger.debug('app.awl_connection.wait_closed() finished')
     except AWLConnectionError:
+        # Try to keep the session before close() logs it out
+        if await resume_awl_session():
+            return
         try:
             app.logger.info('Closing AWL connection')
             await app.awl_connection.close()
@@ -49,6 +84,9 @@ async def awl_reconnection_handler():
     except AWLLoginError:
         # Login failed during session renewal
         app.logger.warning('AWL login failed during session renewal')
+    else:
+        if await resume_awl_session():
+            return
 
     # Re-establish session whenever wait_closed returns,
     # whether with an exception or not
@@ -58,42 +96,57 @@ async def awl_reconnection_handler():
     await establish_awl_session()
 
 
-async def backoff_handler(details):
-    try:
-        max_elapsed = float(app.config['WEBSOCKETS_WARN_AFTER_DISCONNECTED'])
-    except ValueError:
-        max_elapsed = 0.0
-
-    if details['elapsed'] > max_elapsed:
-        app.logger.critical("Cannot reconnect to AWL after {tries} tries "
-                            "over {elapsed:0.1f} seconds. "
-                            "Retrying in {wait:0.1f} "
-                            "seconds.".format(**details))
-
-
-async def backoff_success_handler(details):
-    if details['tries'] > 1:
-        app.logger.warning("Reconnected to AWL after {elapsed:0.1f} "
-                           "seconds ({tries} tries)".format(**details))
+# Cap on the exponential delay between AWL session attempts
+AWL_RECONNECT_MAX_DELAY = 60.0
 
 
 @app.before_serving
-@backoff.on_exception(backoff.expo,
-                      AWLConnectionError,
-                      on_backoff=backoff_handler,
-                      on_success=backoff_success_handler,
-                      max_time=get_runtime_config('AWL_CONNECT_TIMEOUT'))
-@backoff.on_exception(backoff.expo,
-                      AWLLoginError,
-                      on_backoff=backoff_handler,
-                      on_success=backoff_success_handler,
-                      max_time=get_runtime_config('AWL_LOGIN_TIMEOUT'))
 async def establish_awl_session():
-    app.awl_connection = AWL(
-        app.config['WATERFURNACE_USER'],
-        app.config['WATERFURNACE_PASSWORD']
-    )
-    await app.awl_connection.connect()
+    # Read once up front rather than on every retry. The key is only
+    # set for the development, testing and production environments.
+    try:
+        max_elapsed = float(app.config['WEBSOCKETS_WARN_AFTER_DISCONNECTED'])
+    except (KeyError, TypeError, ValueError):
+        max_elapsed = 0.0
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    delay = 1.0
+    tries = 0
+    while True:
+        tries += 1
+        app.awl_connection = AWL(
+            app.config['WATERFURNACE_USER'],
+            app.config['WATERFURNACE_PASSWORD']
+        )
+        try:
+            await app.awl_connection.connect()
+            break
+        except (AWLConnectionError, AWLLoginError) as e:
+            elapsed = loop.time() - start
+            if isinstance(e, AWLLoginError):
+                max_time = app.config.get('AWL_LOGIN_TIMEOUT')
+            else:
+                max_time = app.config.get('AWL_CONNECT_TIMEOUT')
+            if max_time is not None and elapsed >= max_time:
+                raise
+
+            # Full jitter, so many instances don't retry in lockstep
+            wait = random.uniform(0, delay)
+            delay = min(delay * 2, AWL_RECONNECT_MAX_DELAY)
+
+            if elapsed > max_elapsed:
+                app.logger.critical(f"Cannot reconnect to AWL after {tries} "
+                                    f"tries over {elapsed:0.1f} seconds. "
+                                    f"Retrying in {wait:0.1f} seconds.")
+        await asyncio.sleep(wait)
+
+    if tries > 1:
+        app.logger.warning(f"Reconnected to AWL after "
+                           f"{loop.time() - start:0.1f} seconds "
+                           f"({tries} tries)")
+
+    app.login_data_version = getattr(app, 'login_data_version', 0) + 1
     asyncio.create_task(
         awl_reconnection_handler(),
         name='reconnection_loop'
@@ -102,15 +155,136 @@ async def establish_awl_session():
 
 @app.after_serving
 async def close_awl_session():
+    # Stop gateway reads first so they don't fail against a closed
+    # connection and log spurious warnings
+    await stop_gateway_reads()
     await app.awl_connection.close()
 
 
 # Cache reads for 10 seconds to keep from hammering
 # the Symphony API
-@timed_cache(seconds=10)
-async def awl_read_gateway(gwid):
+GATEWAY_CACHE_SECONDS = 10.0
+
+# Gateways that have been requested recently are re-read in the
+# background shortly before their cache entry expires, until nobody
+# has asked for them for GATEWAY_REFRESH_IDLE_SECONDS
+GATEWAY_REFRESH_SECONDS = 9.0
+GATEWAY_REFRESH_IDLE_SECONDS = 60.0
+
+# Matches zone-specific gateway keys, e.g. iz2_z1_roomtemp
+ZONE_KEY_PATTERN = re.compile(r'^iz2_z(\d+)_(.+)$')
+
+# gwid -> (loop time the entry expires, gateway data, zone data by zoneid)
+_gateway_cache = dict()
+# gwid -> read task shared by every request that misses the cache
+# while an upstream read is already in flight
+_gateway_pending = dict()
+# gwid -> loop time of the last request for it, for refreshed gateways
+_gateway_last_requested = dict()
+# gwid -> background refresh task
+_gateway_refresh_tasks = dict()
+
+
+def partition_gateway_zones(gateway_data):
+    zones = dict()
+    for key, value in gateway_data.items():
+        match = ZONE_KEY_PATTERN.match(key)
+        if match is not None:
+            zones.setdefault(int(match[1]), dict())[match[2]] = value
+
+    # Pull e.g. $.iz2_z1_activesettings.* up
+    # to the top level
+    for zoneid, zone_raw_data in zones.items():
+        zone_data = dict(zone_raw_data.pop('activesettings', dict()))
+        zone_data.update(zone_raw_data)
+        zones[zoneid] = zone_data
+
+    return zones
+
+
+async def _awl_read_gateway_entry(gwid):
+    gateway_data = await awl_read_gateway_retry_wrapper(gwid)
+    return (gateway_data, partition_gateway_zones(gateway_data))
+
+
+def _gateway_read_done(gwid, task):
+    del _gateway_pending[gwid]
+    if task.cancelled():
+        return
+    # Retrieving the exception here keeps asyncio from logging it
+    # when every waiting request is gone
+    if task.exception() is None:
+        loop = asyncio.get_running_loop()
+        _gateway_cache[gwid] = (
+            loop.time() + GATEWAY_CACHE_SECONDS,
+            *task.result()
+        )
+        # Only refresh gateways that have been read successfully, so
+        # unknown gwids don't keep failing reads going upstream
+        if gwid not in _gateway_refresh_tasks:
+            _gateway_last_requested[gwid] = loop.time()
+            _gateway_refresh_tasks[gwid] = asyncio.create_task(
+                _refresh_gateway_periodically(gwid),
+                name=f"gateway_refresh_{gwid}"
+            )
+
+
+def _start_gateway_read(gwid):
+    read_task = _gateway_pending.get(gwid)
+    if read_task is None:
+        read_task = asyncio.create_task(_awl_read_gateway_entry(gwid))
+        read_task.add_done_callback(
+            functools.partial(_gateway_read_done, gwid)
+        )
+        _gateway_pending[gwid] = read_task
+    return read_task
+
+
+async def _refresh_gateway_periodically(gwid):
+    loop = asyncio.get_running_loop()
     try:
-        return await awl_read_gateway_retry_wrapper(gwid)
+        while (
+            loop.time() - _gateway_last_requested[gwid]
+            < GATEWAY_REFRESH_IDLE_SECONDS
+        ):
+            await asyncio.sleep(GATEWAY_REFRESH_SECONDS)
+            try:
+                await asyncio.shield(_start_gateway_read(gwid))
+            except AWLException as e:
+                app.logger.warning(
+                    f"Background refresh of gateway {gwid} failed: {e!s}"
+                )
+    finally:
+        del _gateway_refresh_tasks[gwid]
+        del _gateway_last_requested[gwid]
+
+
+async def stop_gateway_reads():
+    # A read that finishes while this runs can still start a refresher
+    # from _gateway_read_done, so repeat until nothing is left
+    while _gateway_refresh_tasks or _gateway_pending:
+        tasks = [
+            *_gateway_refresh_tasks.values(),
+            *_gateway_pending.values(),
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _awl_read_gateway_cached(gwid):
+    loop = asyncio.get_running_loop()
+    if gwid in _gateway_refresh_tasks:
+        _gateway_last_requested[gwid] = loop.time()
+    cached = _gateway_cache.get(gwid)
+    if cached is not None and loop.time() < cached[0]:
+        return cached[1:]
+
+    read_task = _start_gateway_read(gwid)
+    try:
+        # Shield the shared read so one cancelled request
+        # doesn't cancel it for everyone else
+        return await asyncio.shield(read_task)
     except AWLTransactionTimeout:
         abort(504, "AWL read timed out")
     except AWLTransactionError as e:
@@ -119,6 +293,16 @@ async def awl_read_gateway(gwid):
         abort(504, "AWL API not connected")
 
 
+async def awl_read_gateway(gwid):
+    gateway_data, _ = await _awl_read_gateway_cached(gwid)
+    return gateway_data
+
+
+async def awl_read_gateway_zones(gwid):
+    _, zones = await _awl_read_gateway_cached(gwid)
+    return zones
+
+
 @backoff.on_exception(backoff.constant,
                       (AWLConnectionError, AWLTransactionTimeout),
                       max_time=get_runtime_config('AWL_API_TIMEOUT', 0))
@@ -126,10 +310,24 @@ async def awl_read_gateway_retry_wrapper(gwid):
     return await app.awl_connection.read(gwid)
 
 
-def awl_enumerate_gateways():
+# The login_data object that app.login_data_version was assigned to
+_versioned_login_data = dict()
+
+
+def awl_login_data_version():
+    # AWL also replaces login_data on session renewals that never
+    # reach establish_awl_session, so bump the version whenever
+    # the object itself changes too
     awl_login_data = app.awl_connection.login_data
+    if awl_login_data is not _versioned_login_data.get('login_data'):
+        _versioned_login_data['login_data'] = awl_login_data
+        app.login_data_version = getattr(app, 'login_data_version', 0) + 1
+    return app.login_data_version
+
+
+def _enumerate_gateways_checked(locations):
     gateways = list()
-    for location in awl_login_data['locations']:
+    for location in locations:
         for gateway in location['gateways']:
             try:
                 gateways.append({
@@ -143,10 +341,33 @@ def awl_enumerate_gateways():
     return gateways
 
 
-def awl_enumerate_zones():
-    awl_login_data = app.awl_connection.login_data
+# Memoized by login_data version; old versions fall out of the LRU
+@functools.lru_cache(maxsize=4)
+def _enumerate_gateways(version):
+    locations = app.awl_connection.login_data['locations']
+    try:
+        return [
+            {
+                'location': location.get('description'),
+                'gwid': gateway['gwid'],
+                'system_name': gateway.get('description'),
+            }
+            for location in locations
+            for gateway in location['gateways']
+        ]
+    except KeyError:
+        # Take the slow path to log and skip the bad entries
+        return _enumerate_gateways_checked(locations)
+
+
+def awl_enumerate_gateways():
+    return _enumerate_gateways(awl_login_data_version())
+
+
+def _enumerate_zones_checked(locations):
+    logger_error = app.logger.error
     thermostats = list()
-    for location in awl_login_data['locations']:
+    for location in locations:
         for gateway in location['gateways']:
             for key, zone_name in gateway['tstat_names'].items():
                 if zone_name is not None:
@@ -159,31 +380,87 @@ def awl_enumerate_zones():
                             'zone_name': zone_name,
                         })
                     except ValueError:
-                        app.logger.error(
-                            "Couldn't convert zone key \"{key[1:]}\" to int"
+                        logger_error(
+                            f"Couldn't convert zone key \"{key[1:]}\" to int"
                         )
                     except KeyError:
-                        app.logger.error("Couldn't get gwid")
+                        logger_error("Couldn't get gwid")
 
     return thermostats
 
 
+@functools.lru_cache(maxsize=4)
+def _enumerate_zones(version):
+    locations = app.awl_connection.login_data['locations']
+    try:
+        return [
+            {
+                'location': location.get('description'),
+                'gwid': gateway['gwid'],
+                'system_name': gateway.get('description'),
+                'zoneid': int(key[1:]),
+                'zone_name': zone_name,
+            }
+            for location in locations
+            for gateway in location['gateways']
+            for key, zone_name in gateway['tstat_names'].items()
+            if zone_name is not None
+        ]
+    except (KeyError, ValueError):
+        # Take the slow path to log and skip the bad entries
+        return _enumerate_zones_checked(locations)
+
+
+def awl_enumerate_zones():
+    return _enumerate_zones(awl_login_data_version())
+
+
+# Zones indexed by gwid and by (gwid, zoneid) for the per-gateway routes
+@functools.lru_cache(maxsize=4)
+def _zone_index(version):
+    by_gwid = dict()
+    by_gwid_zone = dict()
+    for zone in _enumerate_zones(version):
+        by_gwid.setdefault(zone['gwid'], list()).append(zone)
+        by_gwid_zone[(zone['gwid'], zone['zoneid'])] = zone
+    return (by_gwid, by_gwid_zone)
+
+
+def awl_zone_index():
+    return _zone_index(awl_login_data_version())
+
+
+# Encoded bodies for routes that only depend on login_data
+@functools.lru_cache(maxsize=8)
+def _encode_login_data_view(build, version):
+    return orjson.dumps(build())
+
+
+def awl_raw_login_data():
+    return app.awl_connection.login_data
+
+
+def cached_json_response(build):
+    body = _encode_login_data_view(build, awl_login_data_version())
+    return quart.Response(body, mimetype='application/json')
+
+
 @app.route('/zones')
 async def list_thermostats():
-    return jsonify(awl_enumerate_zones())
+    return cached_json_response(awl_enumerate_zones)
 
 
 @app.route('/gateways')
 async def list_gateways():
     if 'raw' in request.args:
-        return jsonify(app.awl_connection.login_data)
-    return jsonify(awl_enumerate_gateways())
+        return cached_json_response(awl_raw_login_data)
+    return cached_json_response(awl_enumerate_gateways)
 
 
 @app.route('/gateways/<gwid>')
 async def read_gateway(gwid):
     gateway_data = await awl_read_gateway(gwid)
-    return jsonify(gateway_data)
+    return ojsonify(gateway_data)
 
 
 @app.route('/gateways/<gwid>/zones')
@@ -191,62 +468,27 @@ async def list_gateway_zones(gwid):
     if gwid == '*':
         return await list_thermostats()
 
-    gateway_zones = [
-        zone for
-        zone in awl_enumerate_zones()
-        if zone['gwid'] == gwid
-    ]
-    return jsonify(gateway_zones)
+    by_gwid, _ = awl_zone_index()
+    return ojsonify(by_gwid.get(gwid, list()))
 
 
 @app.route('/gateways/<gwid>/zones/<int:zoneid>')
 async def view_gateway_zone(gwid, zoneid):
-    gateway_zone = [
-        zone for
-        zone in awl_enumerate_zones()
-        if zone['gwid'] == gwid and zone['zoneid'] == zoneid
-    ]
-    if len(gateway_zone) == 0:
+    _, by_gwid_zone = awl_zone_index()
+    gateway_zone = by_gwid_zone.get((gwid, zoneid))
+    if gateway_zone is None:
         abort(404,
               f"The gateway {gwid} does not have a zone {zoneid}",
               'Zone Not Found')
-    if len(gateway_zone) > 1:
-        abort(500,
-              'More than one zone was returned '
-              'for the gateway/zone ID specified')
-    return jsonify(gateway_zone[0])
+    return ojsonify(gateway_zone)
 
 
 @app.route('/gateways/<gwid>/zones/<int:zoneid>/details')
 async def read_zone(gwid, zoneid):
-    gateway_data = await awl_read_gateway(gwid)
-
-    # Find all zone-specific data
-    # in the gateway
-    zone_prefix = f"iz2_z{zoneid}_"
-    zone_raw_data = {
-        key: value for
-        (key, value) in gateway_data.items()
-        if key.startswith(zone_prefix)
-    }
-    if len(zone_raw_data) == 0:
+    zones = await awl_read_gateway_zones(gwid)
+    zone_data = zones.get(zoneid)
+    if zone_data is None:
         abort(404,
               f"The gateway {gwid} does not have a zone {zoneid}",
               'Zone Not Found')
-
-    # Pull e.g. $.iz2_z1_activesettings.* up
-    # to the top level
-    zone_data = dict()
-    zone_data.update(
-        zone_raw_data.pop(f"{zone_prefix}activesettings", dict())
-    )
-    zone_data.update(zone_raw_data)
-
-    # Strip the prefix
-    response_data = {
-        key.replace(zone_prefix, '', 1): value
-        for (key, value)
-        in zone_data.items()
-    }
-
-    return jsonify(response_data)
+    return ojsonify(zone_data)